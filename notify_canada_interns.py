@@ -6,53 +6,64 @@ import os
 import re
 import json
 import sys
+import functools
+import hashlib
 import html as html_module
+from itertools import chain, dropwhile, repeat, takewhile
 from typing import List, Dict, Optional
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import lxml.etree
+import lxml.html
 
 RAW_README_URL = "https://raw.githubusercontent.com/SimplifyJobs/Summer2026-Internships/dev/README.md"
 NOTIFIED_STORE = "notified.json"
 DISCORD_WEBHOOK_ENV = "DISCORD_WEBHOOK_URL"
+DISCORD_MAX_EMBEDS = 10
+DISCORD_MAX_EMBED_CHARS = 6000  # combined across all embeds in one message
+
+# Patterns used per row, compiled once at import time
+_SEP_RE = re.compile(r"^\s*-+\s*(\|\s*-+\s*)*$")
+_MD_LINK_RE = re.compile(r'\[.*?\]\((https?://[^\s)]+)\)')
+_HREF_RE = re.compile(r'href=["\'](https?://[^"\']+)["\']')
+_BARE_URL_RE = re.compile(r"(https?://[^\s\)\]]+)")
+_AGE_RE = re.compile(r"\b0\s*d(?:ays?)?\b", re.IGNORECASE)
+_TABLE_RE = re.compile(r"(<table[\s\S]*?</table>)", re.IGNORECASE)
+
+# Shared session so repeated webhook POSTs reuse the same connection
+_SESSION = requests.Session()
+_SESSION.mount(
+    "https://",
+    HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=Retry(total=3, backoff_factor=0.5)),
+)
 
 
 def fetch_readme_raw(url: str = RAW_README_URL, timeout: int = 15) -> str:
-    r = requests.get(url, timeout=timeout)
+    r = _SESSION.get(url, timeout=timeout)
     r.raise_for_status()
-    return r.text
+    # raw.githubusercontent.com serves UTF-8, often without a charset; skip requests' encoding detection
+    return r.content.decode("utf-8")
 
 
 def find_section_markdown(md: str, section_heading_keywords: List[str]) -> Optional[str]:
+    if not section_heading_keywords:
+        return None
+    pat = re.compile("|".join(re.escape(kw) for kw in section_heading_keywords), re.IGNORECASE)
     lines = md.splitlines()
-    start_idx = None
-    for i, line in enumerate(lines):
-        for kw in section_heading_keywords:
-            if kw.lower() in line.lower():
-                start_idx = i
-                break
-        if start_idx is not None:
-            break
+    start_idx = next((i for i, line in enumerate(lines) if pat.search(line)), None)
     if start_idx is None:
         return None
-    for j in range(start_idx + 1, len(lines)):
-        if lines[j].startswith("#"):
-            end_idx = j
-            break
-    else:
-        end_idx = len(lines)
+    end_idx = next((j for j in range(start_idx + 1, len(lines)) if lines[j].startswith("#")), len(lines))
     return "\n".join(lines[start_idx:end_idx])
 
 
 def extract_first_markdown_table(section_md: str) -> Optional[List[str]]:
-    lines = section_md.splitlines()
-    table_lines = []
-    in_table = False
-    for line in lines:
-        if line.strip().startswith("|"):
-            in_table = True
-            table_lines.append(line.rstrip())
-        elif in_table:
-            break
+    def is_table_line(line: str) -> bool:
+        return line.lstrip().startswith("|")
+
+    lines = dropwhile(lambda line: not is_table_line(line), section_md.splitlines())
+    table_lines = [line.rstrip() for line in takewhile(is_table_line, lines)]
     return table_lines or None
 
 
@@ -61,7 +72,7 @@ def parse_markdown_table(table_lines: List[str]) -> List[Dict[str, str]]:
     if len(cleaned) < 2:
         return []
     header_row = cleaned[0]
-    if re.match(r"^\s*-+\s*(\|\s*-+\s*)*$", cleaned[1]):
+    if _SEP_RE.match(cleaned[1]):
         data_rows = cleaned[2:]
     else:
         data_rows = cleaned[1:]
@@ -69,46 +80,48 @@ def parse_markdown_table(table_lines: List[str]) -> List[Dict[str, str]]:
     out = []
     for row in data_rows:
         cells = [c.strip() for c in row.split("|")]
-        while len(cells) < len(headers):
-            cells.append("")
-        out.append({headers[i]: cells[i] for i in range(len(headers))})
+        # pad short rows with "" (zip stops at the last header)
+        out.append(dict(zip(headers, chain(cells, repeat("")))))
     return out
 
 
 def parse_html_table(html_fragment: str) -> Optional[List[Dict[str, str]]]:
-    soup = BeautifulSoup(html_fragment, "lxml")
-    table = soup.find("table")
-    if not table:
+    try:
+        root = lxml.html.fromstring(html_fragment)
+    except (lxml.etree.ParserError, ValueError):
+        return None
+    tables = root.xpath("descendant-or-self::table")
+    if not tables:
         return None
-    ths = table.find_all("th")
+    table = tables[0]
+    all_trs = table.xpath(".//tr")
+    ths = table.xpath(".//th")
     if ths:
-        headers = [th.get_text(strip=True) for th in ths]
+        headers = [th.text_content().strip() for th in ths]
     else:
-        first_tr = table.find("tr")
-        if not first_tr:
+        if not all_trs:
             return None
-        headers = [cell.get_text(strip=True) for cell in first_tr.find_all(["td", "th"])]
+        headers = [cell.text_content().strip() for cell in all_trs[0].xpath("./td|./th")]
     rows = []
-    all_trs = table.find_all("tr")
-    start_idx = 1 if all_trs and all_trs[0].find_all("th") else 0
+    start_idx = 1 if all_trs and all_trs[0].xpath(".//th") else 0
     for tr in all_trs[start_idx:]:
-        cells = tr.find_all(["td", "th"])
+        cells = tr.xpath("./td|./th")
         if not cells:
             continue
-        cell_raw = [str(cell) for cell in cells]
-        cell_text = [cell.get_text(strip=True) for cell in cells]
-        while len(cell_raw) < len(headers):
-            cell_raw.append("")
-            cell_text.append("")
+        cell_raw = (lxml.html.tostring(cell, encoding="unicode", with_tail=False).strip() for cell in cells)
         # store raw HTML string for each header (keeping anchors)
-        rows.append({headers[i]: cell_raw[i].strip() for i in range(len(headers))})
+        rows.append(dict(zip(headers, chain(cell_raw, repeat("")))))
     return rows
 
 
+@functools.lru_cache(maxsize=4096)
 def strip_html_tags(text: str) -> str:
     if not isinstance(text, str):
         return ""
-    return BeautifulSoup(text, "lxml").get_text(strip=True)
+    if "<" not in text and "&" not in text:
+        # plain markdown cell, nothing for the parser to do
+        return text.strip()
+    return lxml.html.fragment_fromstring(text, create_parent=True).text_content().strip()
 
 
 def normalize_url(url: str) -> str:
@@ -117,51 +130,59 @@ def normalize_url(url: str) -> str:
     """
     if not isinstance(url, str):
         return ""
-    return html_module.unescape(url).strip()
+    s = url.strip()
+    if "&" in s:
+        # strip after unescaping so entities like &nbsp; don't end up in the key
+        s = html_module.unescape(s).strip()
+    return s
 
 
 def extract_link_from_cell(cell_text_or_html: str) -> Optional[str]:
     """
-    Prefer extracting href from anchor tags (BeautifulSoup)
+    Prefer extracting href from anchor tags (lxml)
     """
     if not cell_text_or_html:
         return None
 
     try:
-        bs = BeautifulSoup(cell_text_or_html, "lxml")
-        anchors = bs.find_all("a", href=True)
-        if anchors:
-            # prefer anchors that don't point to simplify.jobs/p/
-            for a in anchors:
-                href = a.get("href", "").strip()
-                if href and href.lower().startswith(("http://", "https://")) and "simplify.jobs/p/" not in href.lower():
-                    return normalize_url(href)
-            # otherwise return first absolute href available
-            for a in anchors:
-                href = a.get("href", "").strip()
-                if href and href.lower().startswith(("http://", "https://")):
-                    return normalize_url(href)
+        frag = lxml.html.fragment_fromstring(cell_text_or_html, create_parent=True)
+        anchors = frag.xpath(".//a[@href]")
+        # prefer anchors that don't point to simplify.jobs/p/,
+        # otherwise return first absolute href available
+        first_abs = None
+        for a in anchors:
+            href = a.get("href", "").strip()
+            href_lower = href.lower()
+            if not href_lower.startswith(("http://", "https://")):
+                continue
+            if "simplify.jobs/p/" not in href_lower:
+                return normalize_url(href)
+            if first_abs is None:
+                first_abs = href
+        if first_abs:
+            return normalize_url(first_abs)
     except Exception:
         pass
 
     # Fallback: markdown-style [text](url)
-    m = re.search(r'\[.*?\]\((https?://[^\s)]+)\)', cell_text_or_html)
+    m = _MD_LINK_RE.search(cell_text_or_html)
     if m:
         return normalize_url(m.group(1))
 
     # regex href capture
-    m = re.search(r'href=["\'](https?://[^"\']+)["\']', cell_text_or_html)
+    m = _HREF_RE.search(cell_text_or_html)
     if m:
-        return normalize_url(html_module.unescape(m.group(1)))
+        return normalize_url(m.group(1))
 
     # fallback: any bare http(s) URL
-    m = re.search(r"(https?://[^\s\)\]]+)", cell_text_or_html)
+    m = _BARE_URL_RE.search(cell_text_or_html)
     if m:
         return normalize_url(m.group(1))
 
     return None
 
 
+@functools.lru_cache(maxsize=4096)
 def location_is_canada(location_text: str) -> bool:
     if not location_text:
         return False
@@ -169,16 +190,30 @@ def location_is_canada(location_text: str) -> bool:
     return "canada" in txt  # must contain 'canada'
 
 
+# Stored notified.json entries that are already key digests
+_DIGEST_RE = re.compile(r"[0-9a-f]{16}")
+
+
+def _key_hash(key: str) -> str:
+    """
+    64-bit BLAKE2b digest of a normalized dedupe key, as 16 hex chars.
+    """
+    return hashlib.blake2b(key.encode(), digest_size=8).hexdigest()
+
+
 def load_notified(path=NOTIFIED_STORE) -> set:
     """
-    Load notified.json if present. Normalize (unescape) stored strings so dedupe matches current normalized URLs.
+    Load notified.json if present. Entries are key digests; legacy plain URL entries are hashed on load.
     """
     if os.path.exists(path):
         try:
             with open(path, "r") as f:
                 data = json.load(f)
                 if isinstance(data, list):
-                    return set(normalize_url(x) for x in data if isinstance(x, str))
+                    return set(
+                        x if _DIGEST_RE.fullmatch(x) else _key_hash(normalize_url(x))
+                        for x in data if isinstance(x, str)
+                    )
         except Exception:
             return set()
     return set()
@@ -186,10 +221,10 @@ def load_notified(path=NOTIFIED_STORE) -> set:
 
 def save_notified(notified: set, path=NOTIFIED_STORE):
     """
-    Save sorted normalized list to disk for deterministic artifacts.
+    Save sorted digest list to disk for deterministic artifacts.
     """
     with open(path, "w") as f:
-        json.dump(sorted(list(normalize_url(x) for x in notified)), f, indent=2)
+        json.dump(sorted(notified), f, separators=(",", ":"))
 
 
 def build_normalized_rows(raw_rows: List[Dict[str, str]]) -> List[Dict[str, str]]:
@@ -200,30 +235,30 @@ def build_normalized_rows(raw_rows: List[Dict[str, str]]) -> List[Dict[str, str]
     for r in raw_rows:
         row = {}
         for k, v in r.items():
-            if isinstance(v, str) and ("<" in v and ">" in v and "href" in v):
-                # raw HTML from parse_html_table
-                row[f"{k}_raw"] = v
-                row[k] = strip_html_tags(v)
-            else:
-                row[k] = strip_html_tags(v)
-                row[f"{k}_raw"] = v
+            # strip_html_tags returns plain cells as-is without parsing
+            row[k] = strip_html_tags(v)
+            row[f"{k}_raw"] = v
         normalized.append(row)
     return normalized
 
 
-def send_discord_webhook(webhook_url: str, title: str, description: str, url: Optional[str], fields: List[Dict[str, str]]):
-    payload = {
-        "embeds": [
-            {
-                "title": title,
-                "description": description,
-                "url": url or None,
-                "fields": fields,
-            }
-        ]
-    }
+def embed_chars(embed: Dict) -> int:
+    """
+    Characters Discord counts towards DISCORD_MAX_EMBED_CHARS for one embed.
+    """
+    total = len(embed.get("title") or "") + len(embed.get("description") or "")
+    for field in embed.get("fields", []):
+        total += len(field.get("name") or "") + len(field.get("value") or "")
+    return total
+
+
+def send_discord_webhook(webhook_url: str, embeds: List[Dict]):
+    """
+    Post a single message of at most DISCORD_MAX_EMBEDS embeds; callers handle chunking.
+    """
+    assert len(embeds) <= DISCORD_MAX_EMBEDS
     headers = {"Content-Type": "application/json"}
-    r = requests.post(webhook_url, json=payload, headers=headers, timeout=10)
+    r = _SESSION.post(webhook_url, json={"embeds": embeds}, headers=headers, timeout=10)
     r.raise_for_status()
 
 
@@ -253,7 +288,7 @@ def main():
             print(f"DEBUG: Found HTML table in section ({len(html_rows)} rows).")
             rows = html_rows
         else:
-            m = re.search(r"(<table[\s\S]*?</table>)", md, re.IGNORECASE)
+            m = _TABLE_RE.search(md)
             if m:
                 parsed_any = parse_html_table(m.group(1))
                 if parsed_any:
@@ -264,91 +299,147 @@ def main():
         print("No table rows found.", file=sys.stderr)
         sys.exit(0)
 
-    normalized_rows = build_normalized_rows(rows)
-
-    headers = list(normalized_rows[0].keys())
-    human_headers = [h for h in headers if not h.endswith("_raw")]
-
-    application_header = next((h for h in human_headers if "apply" in h.lower() or "application" in h.lower()), None)
-    location_header = next((h for h in human_headers if "location" in h.lower()), None)
-    company_header = next((h for h in human_headers if "company" in h.lower()), human_headers[0] if human_headers else "Company")
-    role_header = next((h for h in human_headers if "role" in h.lower() or "position" in h.lower()), human_headers[1] if len(human_headers) > 1 else "Role")
-    age_header = next((h for h in human_headers if "age" in h.lower()), None)
+    human_headers = list(rows[0].keys())
+
+    # Classify columns in one pass; first matching header wins
+    cols = {}
+    for h in human_headers:
+        hl = h.lower()
+        if "apply" in hl or "application" in hl:
+            cols.setdefault("app", h)
+        elif "location" in hl:
+            cols.setdefault("loc", h)
+        elif "company" in hl:
+            cols.setdefault("co", h)
+        elif "role" in hl or "position" in hl:
+            cols.setdefault("role", h)
+        elif "age" in hl:
+            cols.setdefault("age", h)
+
+    application_header = cols.get("app")
+    location_header = cols.get("loc")
+    company_header = cols.get("co", human_headers[0] if human_headers else "Company")
+    role_header = cols.get("role", human_headers[1] if len(human_headers) > 1 else "Role")
+    age_header = cols.get("age")
+
+    # Cheap pre-filter on raw cells so only likely matches get HTML-stripped;
+    # the exact Canada/age checks still run on the normalized rows below
+    candidate_rows = [
+        r for r in rows
+        if "canada" in (r.get(location_header) or "").lower() and _AGE_RE.search(r.get(age_header) or "")
+    ]
+    normalized_rows = build_normalized_rows(candidate_rows)
 
     notified = load_notified()
     newly_notified = []
+    pending = []  # (key, embed, summary) waiting to be sent
 
-    last_valid_link = None
-    previous_company = None
-
-    for item in normalized_rows:
-        location = item.get(location_header, "")
-        age = item.get(age_header, "")
-
-        # Only rows that explicitly say "Canada" in the location text
-        if not location_is_canada(location):
-            continue
-
-        # Strict age match: accept "0d", "0 d", "0 days"
-        if not age or not re.search(r"\b0\s*d\b|\b0\s*days?\b", age.lower()):
-            continue
-
-        # Prefer raw application cell (preserves anchors)
-        app_raw_key = (application_header + "_raw") if application_header else None
-        app_raw_val = item.get(app_raw_key or "", "") if app_raw_key else ""
-        current_link = extract_link_from_cell(app_raw_val) or extract_link_from_cell(item.get(application_header or "", ""))
-
-        company_text_raw = item.get(company_header, "")
-        company_text_stripped = strip_html_tags(company_text_raw).strip() if company_text_raw else ""
-
-        # Track previous main-row company
-        if company_text_stripped and company_text_stripped != "↳":
-            previous_company = company_text_stripped
-
-        # If main row and has a link, update last_valid_link
-        if company_text_stripped and company_text_stripped != "↳" and current_link:
-            last_valid_link = current_link
-
-        # For sub-rows, fall back to last_valid_link if current is missing
-        link = current_link or last_valid_link
-
-        # Build dedupe key:
-        if link:
-            key = normalize_url(link)
-        else:
-            comp_for_key = previous_company if company_text_stripped == "↳" and previous_company else company_text_stripped
-            role_text = (item.get(role_header, "") or "").strip()
-            loc_text = strip_html_tags(location).strip()
-            key = normalize_url(f"{comp_for_key}|{role_text}|{loc_text}")
+    def record_sent(entries):
+        for key, _, summary in entries:
+            print(f"Notified: {summary}")
+            notified.add(key)
+            newly_notified.append(key)
 
-        # Skip if already notified
-        if key in notified:
-            continue
+    def flush_pending():
+        if not pending:
+            return
+        try:
+            send_discord_webhook(webhook_url, [embed for _, embed, _ in pending])
+            record_sent(pending)
+        except requests.HTTPError as e:
+            status = e.response.status_code if e.response is not None else None
+            if status is not None and 400 <= status < 500 and len(pending) > 1:
+                # Discord rejected the batch (often one bad embed); retry one at a time
+                for entry in pending:
+                    try:
+                        send_discord_webhook(webhook_url, [entry[1]])
+                        record_sent([entry])
+                    except Exception as e2:
+                        print("Failed sending webhook for", entry[2], ":", e2, file=sys.stderr)
+            else:
+                print("Failed sending webhook for", "; ".join(summary for _, _, summary in pending), ":", e, file=sys.stderr)
+        except Exception as e:
+            print("Failed sending webhook for", "; ".join(summary for _, _, summary in pending), ":", e, file=sys.stderr)
+        pending.clear()
 
-        # Compose message fields (use previous_company for subrows)
-        company_display = previous_company if company_text_stripped == "↳" and previous_company else company_text_stripped
-        role_display = strip_html_tags(item.get(role_header, ""))
-        loc_display = strip_html_tags(location)
-        age_display = age or ""
-
-        fields = [
-            {"name": "Company", "value": company_display or "—", "inline": True},
-            {"name": "Role", "value": role_display or "—", "inline": True},
-            {"name": "Location", "value": loc_display or "—", "inline": True},
-            {"name": "Age", "value": age_display or "—", "inline": True},
-        ]
-        description = f"[Click to apply]({link})" if link else "Application link not found."
-        title = f"New Canada Software Engineering Intern — {company_display or 'Unknown'}"
+    last_valid_link = None
+    previous_company = None
 
-        try:
-            send_discord_webhook(webhook_url, title=title, description=description, url=link, fields=fields)
-            print(f"Notified: {company_display} — {role_display} — {loc_display}")
-            # Ensure saved values are normalized
-            notified.add(key)
+    try:
+        for item in normalized_rows:
+            location = item.get(location_header, "")
+            age = item.get(age_header, "")
+
+            # Only rows that explicitly say "Canada" in the location text
+            if not location_is_canada(location):
+                continue
+
+            # Strict age match: accept "0d", "0 d", "0 days"
+            if not age or not _AGE_RE.search(age):
+                continue
+
+            # Prefer raw application cell (preserves anchors)
+            app_raw_key = (application_header + "_raw") if application_header else None
+            app_raw_val = item.get(app_raw_key or "", "") if app_raw_key else ""
+            current_link = extract_link_from_cell(app_raw_val) or extract_link_from_cell(item.get(application_header or "", ""))
+
+            # Normalized cells are already stripped of HTML
+            company_text_stripped = (item.get(company_header) or "").strip()
+            is_subrow = company_text_stripped == "↳"
+
+            # Track previous main-row company and, if it has one, its link
+            if not is_subrow and company_text_stripped:
+                previous_company = company_text_stripped
+                if current_link:
+                    last_valid_link = current_link
+
+            # Use previous_company for subrows
+            company_display = previous_company if is_subrow and previous_company else company_text_stripped
+
+            # For sub-rows, fall back to last_valid_link if current is missing
+            link = current_link or last_valid_link
+
+            # Build dedupe key:
+            if link:
+                key = normalize_url(link)
+            else:
+                role_text = (item.get(role_header, "") or "").strip()
+                loc_text = strip_html_tags(location).strip()
+                key = normalize_url(f"{company_display}|{role_text}|{loc_text}")
+
+            key = _key_hash(key)
+
+            # Skip if already notified
+            if key in notified or any(key == k for k, _, _ in pending):
+                continue
+
+            # Compose message fields
+            role_display = strip_html_tags(item.get(role_header, ""))
+            loc_display = strip_html_tags(location)
+            age_display = age or ""
+
+            fields = [
+                {"name": "Company", "value": company_display or "—", "inline": True},
+                {"name": "Role", "value": role_display or "—", "inline": True},
+                {"name": "Location", "value": loc_display or "—", "inline": True},
+                {"name": "Age", "value": age_display or "—", "inline": True},
+            ]
+            description = f"[Click to apply]({link})" if link else "Application link not found."
+            title = f"New Canada Software Engineering Intern — {company_display or 'Unknown'}"
+
+            embed = {"title": title, "description": description, "url": link or None, "fields": fields}
+            # Start a new message if this embed would break Discord's count or size limit
+            if pending and (
+                len(pending) >= DISCORD_MAX_EMBEDS
+                or sum(embed_chars(e) for _, e, _ in pending) + embed_chars(embed) > DISCORD_MAX_EMBED_CHARS
+            ):
+                flush_pending()
+            pending.append((key, embed, f"{company_display} — {role_display} — {loc_display}"))
+        flush_pending()
+    finally:
+        # Persist once per run, even if the loop crashed part way through
+        if newly_notified:
             save_notified(notified)
-            newly_notified.append(key)
-        except Exception as e:
-            print("Failed sending webhook for", company_display, ":", e, file=sys.stderr)
 
     if newly_notified:
         print(f"Saved {len(newly_notified)} new notified items.")